@@ -1,14 +1,25 @@
 #!/bin/env python3
+import atexit
+import base64
 import subprocess
+import concurrent.futures
+import threading
 import os
+import shutil
+import tempfile
+import time
 import re
 import datetime
 import math
+import random
 import sys
-import urllib.request
 import urllib.parse
+import urllib.request
+import http.client
 import json
+import dataclasses
 import logging
+from typing import Optional
 
 # --- Configuration ---
 
@@ -27,6 +38,10 @@ PUSHOVER_ENABLED = False # Control Pushover notifications
 POOLS_TO_MONITOR = ["rpool"] # List of ZFS pools to monitor
 RATED_TBW = 360 # Assumed SSD TBW rating in Terabytes
 REPLACEMENT_YEARS_AGE_LIMIT = 5 # Default age limit for replacement suggestion
+SKIP_STANDBY = True # Skip SMART checks for drives that hdparm reports as in standby/sleeping
+SMART_TTL_SECONDS = 1800 # Reuse cached SMART attributes younger than this (health is still checked every run); 0 disables the cache
+SMART_CACHE_DIR = "/var/run/proxmox-zpool-monitor" # Where cached SMART attributes are kept
+SMART_MAX_CONCURRENT = 4 # Maximum number of smartctl queries running at the same time
 VERBOSE = False # Set to True to print status updates and raw smartctl output to console
 
 # --- Logging Setup ---
@@ -36,118 +51,269 @@ logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
 
 HOSTNAME = os.uname().nodename
 
+# Notification titles that only depend on the hostname
+TITLE_HOST_SUFFIX = f" - {HOSTNAME}"
+TITLE_POOL_SUMMARY = f"ZFS Status Summary{TITLE_HOST_SUFFIX}"
+
+# Notification providers that are both enabled and configured
+GOTIFY_ACTIVE = GOTIFY_ENABLED and GOTIFY_API_KEY != "UNSET" and bool(GOTIFY_URL)
+PUSHOVER_ACTIVE = PUSHOVER_ENABLED and PUSHOVER_APP_TOKEN != "UNSET" and PUSHOVER_USER_KEY != "UNSET"
+
+# Dates are fixed once per run, so every drive gets the same replacement horizon
+TODAY = datetime.date.today()
+AGE_LIMIT_DELTA = datetime.timedelta(days=REPLACEMENT_YEARS_AGE_LIMIT * 365)
+REPLACE_BY_AGE_DATE = TODAY + AGE_LIMIT_DELTA
+ONE_YEAR_FROM_NOW = TODAY + datetime.timedelta(days=365)
+
+# Environment for external commands, with /usr/sbin (zpool, zfs, smartctl) in PATH
+COMMAND_ENV = os.environ.copy()
+if '/usr/sbin' not in COMMAND_ENV.get('PATH', '').split(os.pathsep):
+    COMMAND_ENV['PATH'] = f"/usr/sbin{os.pathsep}{COMMAND_ENV.get('PATH', '')}"
+
+# Resolved executable paths, so PATH is only searched once per binary
+COMMAND_PATHS = {}
+
+# hdparm is optional; without it every drive is polled
+HDPARM_AVAILABLE = shutil.which("hdparm", path=COMMAND_ENV.get('PATH')) is not None
+
+# Precompiled patterns for parsing `zpool status` output
+CONFIG_SECTION_RE = re.compile(r"config:.*?(\n\s+errors:.*)?$", re.DOTALL | re.MULTILINE)
+NO_KNOWN_ERRORS_RE = re.compile(r"\n\s+errors: No known data errors")
+DISK_ID_RE = re.compile(r"\b(?:ata-|nvme-|wwn-)[^\s/]+")
+
+# smartctl's exit status is a bitmask: bits 0-1 mean the device couldn't be queried at all,
+# bit 2 that some SMART command (e.g. the attribute read) failed, and bit 4 that a prefail
+# attribute is at or below its threshold even if the overall health check passed
+SMART_RETRIEVAL_ERROR_BITS = 0x03
+SMART_COMMAND_FAILED_BIT = 0x04
+SMART_PREFAIL_BIT = 0x10
+
+# Limits concurrent smartctl queries; each one also waits a random 0-0.25s so they don't all start together
+SMART_SEMAPHORE = threading.Semaphore(SMART_MAX_CONCURRENT)
+SMART_START_JITTER = 0.25
+
+# Persistent HTTP connections used for notifications, keyed by (thread, scheme, host)
+# since an http.client connection can't be used from two threads at once
+HTTP_CONNECTIONS = {}
+
+# Proxies from the environment (http_proxy, https_proxy, no_proxy), as urlopen would use them
+HTTP_PROXIES = urllib.request.getproxies()
+
+# One worker per provider: Gotify and Pushover are posted to in parallel, while each
+# provider's requests stay in order and its connection is never shared between threads
+GOTIFY_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+PUSHOVER_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+NOTIFICATION_WAIT_TIMEOUT = 12 # Seconds to wait for the providers (each request has a 10s timeout)
+
 # --- Helper Functions ---
 
-def run_command(command):
-    """Runs a shell command and returns its output, ensuring /usr/sbin is in PATH."""
+def resolve_command(name):
+    """Returns the full path of an executable, searching PATH only the first time it is seen."""
+    executable = COMMAND_PATHS.get(name)
+    if executable is None:
+        executable = shutil.which(name, path=COMMAND_ENV.get('PATH')) or name
+        COMMAND_PATHS[name] = executable
+    return executable
+
+def run_command(argv):
+    """Runs a command (given as an argument list, without a shell) and returns its output."""
     try:
-        env = os.environ.copy()
-        current_path = env.get('PATH', '')
-        if '/usr/sbin' not in current_path.split(os.pathsep):
-            env['PATH'] = f"/usr/sbin{os.pathsep}{current_path}"
-
-        result = subprocess.run(command, shell=True, capture_output=True, text=True, check=False, env=env)
-        if result.returncode != 0:
-            pass
+        result = subprocess.run([resolve_command(argv[0]), *argv[1:]], capture_output=True, text=True, check=False, env=COMMAND_ENV)
         return result.stdout.strip(), result.stderr.strip(), result.returncode
     except Exception as e:
-        logging.error(f"Error running command '{command}': {e}")
-        return None, str(e), -1
-
-def parse_smartctl_value(output, attribute_name):
-    for line in output.splitlines():
-        parts = line.split()
-        if len(parts) >= 10 and parts[1] == attribute_name:
-            return parts[9]
-
-    search_key = attribute_name.strip().lower()
-    for line in output.splitlines():
-        if ':' in line:
-            key, value = line.split(':', 1)
-            key = key.strip().lower()
-            if key == search_key:
-                return value.strip()
-    return None
+        logging.error(f"Error running command '{' '.join(argv)}': {e}")
+        return "", str(e), -1
 
-def parse_smartctl_health(output):
-    if "PASSED" in output:
-        return "✅ PASSED"
-    elif "FAILED" in output:
-        return "❌ FAILED"
-    else:
-        if "SMART overall-health self-assessment test result: FAILED" in output:
-             return "❌ FAILED"
-        if "SMART Health Status: OK" in output:
-             return "✅ PASSED"
-    return "❓ Unknown"
-
-def parse_smartctl_model(output):
-    for line in output.splitlines():
-        if line.startswith("Device Model:") or line.startswith("Device:"):
-            return line.split(":", 1)[1].strip()
-    return "N/A"
+def run_command_json(argv):
+    """Runs a command that prints JSON and returns (data, stderr, returncode).
 
-def send_notification(title, message, priority_level):
+    The data is an empty dict if the output is missing or not valid JSON.
+    """
+    out, err, rc = run_command(argv)
+    try:
+        return json.loads(out), err, rc
+    except ValueError:
+        return {}, err, rc
+
+@dataclasses.dataclass
+class SmartInfo:
+    """The SMART fields used by the disk check, as read from one `smartctl --json` document."""
+    model: str = "N/A"
+    health: str = "❓ Unknown"
+    temp: Optional[int] = None
+    hours: Optional[int] = None
+    pct_used: Optional[int] = None
+    life_remain: Optional[int] = None
+    wear_lvl: Optional[int] = None
+    data_units_written: Optional[int] = None
+    lba_written: Optional[int] = None
+    erase_count: Optional[int] = None
+
+# SATA attributes (by name) whose raw values fill SmartInfo fields
+SATA_ATTRIBUTE_FIELDS = {
+    "Percent_Lifetime_Remain": "life_remain",
+    "Wear_Leveling_Count": "wear_lvl",
+    "Total_LBAs_Written": "lba_written",
+    "Ave_Block-Erase_Count": "erase_count",
+}
+
+def parse_smartctl_all(smart):
+    """Reads decoded `smartctl --json` output into a SmartInfo, walking the SATA attribute table once."""
+    nvme_log = smart.get("nvme_smart_health_information_log", {})
+    info = SmartInfo(
+        model=smart.get("model_name", "N/A"),
+        temp=smart.get("temperature", {}).get("current"),
+        hours=smart.get("power_on_time", {}).get("hours"),
+        pct_used=nvme_log.get("percentage_used"),
+        data_units_written=nvme_log.get("data_units_written"),
+    )
+
+    passed = smart.get("smart_status", {}).get("passed")
+    if passed is True:
+        info.health = "✅ PASSED"
+    elif passed is False:
+        info.health = "❌ FAILED"
+
+    for attribute in smart.get("ata_smart_attributes", {}).get("table", []):
+        field = SATA_ATTRIBUTE_FIELDS.get(attribute.get("name"))
+        if field:
+            setattr(info, field, attribute.get("raw", {}).get("value"))
+    return info
+
+def notification_proxy(parsed):
+    """Returns the split URL of the environment's proxy for a split notification URL, or None if it should be reached directly."""
+    proxy = HTTP_PROXIES.get(parsed.scheme)
+    if not proxy or urllib.request.proxy_bypass(parsed.hostname or ""):
+        return None
+    return urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+
+def post_form(url, payload, headers=None):
+    """POSTs a URL-encoded form over a persistent (keep-alive) connection to the URL's host and returns the response."""
+    parsed = urllib.parse.urlsplit(url)
+    key = (threading.get_ident(), parsed.scheme, parsed.netloc)
+    path = parsed.path or "/"
+    if parsed.query:
+        path = f"{path}?{parsed.query}"
+    body = urllib.parse.urlencode(payload).encode('utf-8')
+    request_headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    request_headers.update(headers or {})
+
+    proxy = notification_proxy(parsed)
+    proxy_headers = {}
+    if proxy is not None:
+        if proxy.username:
+            credentials = f"{urllib.parse.unquote(proxy.username)}:{urllib.parse.unquote(proxy.password or '')}"
+            proxy_headers["Proxy-Authorization"] = f"Basic {base64.b64encode(credentials.encode('utf-8')).decode('ascii')}"
+        if parsed.scheme != "https":
+            # A plain HTTP proxy takes the absolute URL and forwards the request itself
+            path = url
+            request_headers.update(proxy_headers)
+
+    while True:
+        conn = HTTP_CONNECTIONS.get(key)
+        reused = conn is not None
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+            if proxy is None:
+                conn = conn_class(parsed.netloc, timeout=10)
+            else:
+                conn = conn_class(proxy.hostname, proxy.port or 80, timeout=10)
+                if parsed.scheme == "https":
+                    # HTTPS goes through a CONNECT tunnel, with TLS negotiated end to end with the real host
+                    conn.set_tunnel(parsed.netloc, headers=proxy_headers)
+            HTTP_CONNECTIONS[key] = conn
+
+        try:
+            conn.request("POST", path, body=body, headers=request_headers)
+            response = conn.getresponse()
+            response.read()
+            return response
+        except Exception as e:
+            # Drop the broken connection so the next request reconnects
+            conn.close()
+            HTTP_CONNECTIONS.pop(key, None)
+            # The server may have closed an idle keep-alive connection; retry once on a fresh one
+            if reused and isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)):
+                continue
+            raise
+
+def close_http_connections():
+    """Closes all persistent notification connections."""
+    for conn in HTTP_CONNECTIONS.values():
+        conn.close()
+    HTTP_CONNECTIONS.clear()
+
+atexit.register(close_http_connections)
+
+def send_gotify_notification(title, message, priority_level):
+    try:
+        payload = {
+            "title": title,
+            "message": message,
+            "priority": priority_level
+        }
+        headers = {"X-Gotify-Key": GOTIFY_API_KEY}
+        response = post_form(GOTIFY_URL, payload, headers)
+        if response.status < 200 or response.status >= 300:
+             logging.warning(f"Gotify notification failed with status: {response.status} {response.reason}")
+    except (OSError, http.client.HTTPException) as e:
+        logging.error(f"Error sending Gotify notification (connection): {e}")
+    except Exception as e:
+         logging.error(f"Error sending Gotify notification (Other): {e}")
+
+def send_pushover_notification(title, message, priority_level):
     pushover_priority = 0
     if priority_level <= 1:
         pushover_priority = -1
     elif priority_level >= 8:
         pushover_priority = 1
 
-    if GOTIFY_ENABLED and GOTIFY_API_KEY != "UNSET" and GOTIFY_URL:
-        try:
-            payload = {
-                "title": title,
-                "message": message,
-                "priority": priority_level
-            }
-            data = urllib.parse.urlencode(payload).encode('utf-8')
-            headers = {"X-Gotify-Key": GOTIFY_API_KEY}
-            req = urllib.request.Request(GOTIFY_URL, data=data, headers=headers, method='POST')
-            with urllib.request.urlopen(req, timeout=10) as response:
-                if response.status < 200 or response.status >= 300:
-                     logging.warning(f"Gotify notification failed with status: {response.status} {response.reason}")
-        except urllib.error.URLError as e:
-            logging.error(f"Error sending Gotify notification (URLError): {e}")
-        except Exception as e:
-             logging.error(f"Error sending Gotify notification (Other): {e}")
-
-    if PUSHOVER_ENABLED and PUSHOVER_APP_TOKEN != "UNSET" and PUSHOVER_USER_KEY != "UNSET":
-        try:
-            payload = {
-                "token": PUSHOVER_APP_TOKEN,
-                "user": PUSHOVER_USER_KEY,
-                "title": title,
-                "message": message,
-                "priority": pushover_priority,
-            }
-            data = urllib.parse.urlencode(payload).encode('utf-8')
-            req = urllib.request.Request(PUSHOVER_API_URL, data=data, method='POST')
-            with urllib.request.urlopen(req, timeout=10) as response:
-                 if response.status < 200 or response.status >= 300:
-                     logging.warning(f"Pushover notification failed with status: {response.status} {response.reason}")
-        except urllib.error.URLError as e:
-            logging.error(f"Error sending Pushover notification (URLError): {e}")
-        except Exception as e:
-             logging.error(f"Error sending Pushover notification (Other): {e}")
-
-# --- Main Logic ---
-
-overall_health = "✅ Healthy"
-overall_priority = 1
-all_disks = set()
-main_message_parts = []
-
-logging.info("--- Starting ZFS Pool Check ---")
+    try:
+        payload = {
+            "token": PUSHOVER_APP_TOKEN,
+            "user": PUSHOVER_USER_KEY,
+            "title": title,
+            "message": message,
+            "priority": pushover_priority,
+        }
+        response = post_form(PUSHOVER_API_URL, payload)
+        if response.status < 200 or response.status >= 300:
+             logging.warning(f"Pushover notification failed with status: {response.status} {response.reason}")
+    except (OSError, http.client.HTTPException) as e:
+        logging.error(f"Error sending Pushover notification (connection): {e}")
+    except Exception as e:
+         logging.error(f"Error sending Pushover notification (Other): {e}")
 
-for pool_name in POOLS_TO_MONITOR:
+def send_notification(title, message, priority_level):
+    """Posts to all active providers in parallel and waits (bounded) for them to finish."""
+    if not (GOTIFY_ACTIVE or PUSHOVER_ACTIVE):
+        return
+
+    futures = []
+    if GOTIFY_ACTIVE:
+        futures.append(GOTIFY_EXECUTOR.submit(send_gotify_notification, title, message, priority_level))
+    if PUSHOVER_ACTIVE:
+        futures.append(PUSHOVER_EXECUTOR.submit(send_pushover_notification, title, message, priority_level))
+
+    _, pending = concurrent.futures.wait(futures, timeout=NOTIFICATION_WAIT_TIMEOUT)
+    if pending:
+        logging.warning(f"Notification '{title}' still pending after {NOTIFICATION_WAIT_TIMEOUT}s, continuing.")
+
+def strip_partition_suffix(disk_id):
+    """Strips a trailing `-partN` from a disk id."""
+    base, sep, part = disk_id.rpartition("-part")
+    return base if sep and part.isdigit() else disk_id
+
+def process_pool(pool_name):
+    """Checks one ZFS pool and returns its summary text, priority, and the set of disk IDs it uses."""
     pool_summary_lines = []
+    pool_disks = set()
     pool_msg = ""
     current_priority = 1
     pool_usage = ""
     pool_detail = ""
 
-    stdout, stderr, retcode = run_command(f"zpool status -x \"{pool_name}\"")
+    stdout, stderr, retcode = run_command(["zpool", "status", "-x", pool_name])
 
     if retcode == 0 and f"pool '{pool_name}' is healthy" in stdout:
         pool_msg = "✅ Healthy"
@@ -162,149 +328,173 @@ for pool_name in POOLS_TO_MONITOR:
 
     logging.info(f"Pool '{pool_name}': {pool_msg}")
 
-    if current_priority > overall_priority:
-        overall_priority = current_priority
-        overall_health = "⚠️ Check Details"
-
     pool_summary_lines.append(f"{HOSTNAME} Pool '{pool_name}': {pool_msg}")
 
     if "not found" not in pool_msg:
-        used_out, _, _ = run_command(f"zfs get -H -o value used \"{pool_name}\"")
-        avail_out, _, _ = run_command(f"zfs get -H -o value available \"{pool_name}\"")
-        ratio_out, _, _ = run_command(f"zfs get -H -o value compressratio \"{pool_name}\"")
-        if used_out and avail_out and ratio_out:
+        usage_out, _, _ = run_command(["zfs", "get", "-H", "-o", "value", "used,available,compressratio", pool_name])
+        usage_values = usage_out.splitlines() if usage_out else []
+        if len(usage_values) == 3 and all(usage_values):
+             used_out, avail_out, ratio_out = usage_values
              pool_usage = f"📊 Usage: {used_out} used, {avail_out} free ({ratio_out} compression)"
              pool_summary_lines.append(pool_usage)
 
-        if pool_msg != "✅ Healthy":
-             stdout_detail, _, _ = run_command(f"zpool status \"{pool_name}\"")
-             if stdout_detail:
-                 config_section = re.search(r"config:.*?(\n\s+errors:.*)?$", stdout_detail, re.DOTALL | re.MULTILINE)
+        # For an unhealthy pool, `zpool status -x` has already printed the full status
+        if pool_msg != "✅ Healthy" and "config:" in stdout:
+            status_full = stdout
+        else:
+            status_full, _, _ = run_command(["zpool", "status", pool_name])
+        if status_full:
+             if pool_msg != "✅ Healthy":
+                 config_section = CONFIG_SECTION_RE.search(status_full)
                  if config_section:
                      pool_detail = config_section.group(0).strip()
-                     pool_detail = re.sub(r"\n\s+errors: No known data errors", "", pool_detail)
+                     pool_detail = NO_KNOWN_ERRORS_RE.sub("", pool_detail)
                      pool_summary_lines.append(f"\nPool Configuration/Status:\n{pool_detail}")
 
-        stdout_disks, _, _ = run_command(f"zpool status \"{pool_name}\"")
-        if stdout_disks:
-             found_ids = re.findall(r"\b(?:ata-|nvme-|wwn-)[^\s/]+", stdout_disks)
-             cleaned_ids = {re.sub(r'(-part\d+|-part\d+)$', '', id) for id in found_ids}
-             all_disks.update(cleaned_ids)
+             # Dedup first, since every partition of a disk shows up as its own id
+             pool_disks.update(strip_partition_suffix(disk_id) for disk_id in set(DISK_ID_RE.findall(status_full)))
 
-    main_message_parts.append("\n".join(pool_summary_lines))
+    return "\n".join(pool_summary_lines), current_priority, pool_disks
 
-logging.info("--- ZFS Pool Check Complete ---")
-
-full_main_message = f"\n\n---\n\n".join(main_message_parts)
-logging.info("Sending Summary Notification...")
-send_notification(f"ZFS Status Summary - {HOSTNAME}", full_main_message, overall_priority)
+def scan_smart_devices():
+    """Runs `smartctl --scan-open` once and returns a {device path: device type} map for all SMART-capable devices."""
+    scan, scan_err, ret_scan = run_command_json(["smartctl", "--scan-open", "--json=c"])
+    if ret_scan != 0:
+        logging.warning(f"smartctl --scan-open failed, device types will be auto-detected: {scan_err}")
+    return {device["name"]: device["type"] for device in scan.get("devices", []) if "name" in device and "type" in device}
 
-logging.info("--- Starting Disk SMART Check ---")
-for disk_id in sorted(list(all_disks)):
+def read_smart_cache(disk_id):
+    """Returns the cached `smartctl -iHA` data for a disk if it is younger than SMART_TTL_SECONDS, or None."""
+    cache_path = os.path.join(SMART_CACHE_DIR, f"{disk_id}.json")
+    try:
+        if time.time() - os.stat(cache_path).st_mtime >= SMART_TTL_SECONDS:
+            return None
+        with open(cache_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_smart_cache(disk_id, smart):
+    """Stores a disk's `smartctl -iHA` data in SMART_CACHE_DIR, replacing any previous copy atomically."""
+    temp_path = None
+    try:
+        os.makedirs(SMART_CACHE_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", encoding='utf-8', dir=SMART_CACHE_DIR, prefix=f".{disk_id}.", delete=False) as f:
+            temp_path = f.name
+            json.dump(smart, f)
+        os.replace(temp_path, os.path.join(SMART_CACHE_DIR, f"{disk_id}.json"))
+    except OSError as e:
+        logging.warning(f"Could not cache SMART data for {disk_id}: {e}")
+        # Don't leave the partial temporary file behind
+        if temp_path is not None:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+def process_disk(disk_id, smart_device_types):
+    """Runs the SMART checks for one disk and returns a (title, message, priority) notification, or None if the drive is OK."""
     drive_message_lines = []
     disk_dev_path = f"/dev/disk/by-id/{disk_id}"
     send_drive_notification = False
     drive_priority = 1
     drive_issue_reason = ""
 
-    if not os.path.exists(disk_dev_path):
+    # os.stat follows the by-id symlink, so this also fails if the device it points to is gone
+    try:
+        os.stat(disk_dev_path)
+    except OSError:
         logging.info(f"Skipping disk ID {disk_id}: Path {disk_dev_path} not found.")
-        continue
+        return None
 
     try:
-        device_path = os.path.realpath(disk_dev_path)
-        disk_dev = os.path.basename(device_path)
-
-        if not os.path.exists(f"/dev/{disk_dev}"):
-             logging.info(f"Skipping disk ID {disk_id}: Resolved device /dev/{disk_dev} does not exist.")
-             continue
-
-        info_out, info_err, ret_info = run_command(f"smartctl --nocheck=standby -i /dev/{disk_dev}")
-        health_out, health_err, ret_health = run_command(f"smartctl --nocheck=standby -H /dev/{disk_dev}")
-        attrs_out, attrs_err, ret_attrs = run_command(f"smartctl --nocheck=standby -A /dev/{disk_dev}")
-
-        logging.debug(f"\n--- Raw SMART Data: {disk_dev} (ID: {disk_id}) ---")
-        logging.debug("--- smartctl -i ---")
-        logging.debug(info_out)
-        if info_err: logging.debug(f"stderr: {info_err}")
-        logging.debug("--- smartctl -H ---")
-        logging.debug(health_out)
-        if health_err: logging.debug(f"stderr: {health_err}")
-        logging.debug("--- smartctl -A ---")
-        logging.debug(attrs_out)
-        if attrs_err: logging.debug(f"stderr: {attrs_err}")
+        link_target = os.readlink(disk_dev_path)
+        disk_dev = os.path.basename(os.path.normpath(os.path.join(os.path.dirname(disk_dev_path), link_target)))
+
+        # hdparm -C only asks for the ATA power mode, so unlike smartctl it doesn't touch the drive's I/O queue
+        if SKIP_STANDBY and HDPARM_AVAILABLE and not disk_dev.startswith("nvme"):
+            state_out, _, _ = run_command(["hdparm", "-C", f"/dev/{disk_dev}"])
+            if "standby" in state_out or "sleeping" in state_out:
+                logging.info(f"Drive {disk_dev} (ID: {disk_id}) is asleep, SMART check skipped.")
+                return None
+
+        device_args = []
+        if f"/dev/{disk_dev}" in smart_device_types:
+            device_args = ["-d", smart_device_types[f"/dev/{disk_dev}"]]
+
+        # Attributes change slowly, so while the cached copy is fresh only the health verdict is re-read
+        smart = read_smart_cache(disk_id) if SMART_TTL_SECONDS > 0 else None
+        smart_flags = "-H" if smart is not None else "-iHA"
+        with SMART_SEMAPHORE:
+            time.sleep(random.uniform(0, SMART_START_JITTER))
+            result, smart_err, ret_smart = run_command_json(["smartctl", "--nocheck=standby", "--json=c", smart_flags] + device_args + [f"/dev/{disk_dev}"])
+        smart_failed = bool(ret_smart & SMART_RETRIEVAL_ERROR_BITS) or "smart_status" not in result
+        if smart is not None:
+            smart["smart_status"] = result.get("smart_status", {})
+        else:
+            smart = result
+            if not smart_failed and SMART_TTL_SECONDS > 0:
+                write_smart_cache(disk_id, smart)
+
+        logging.debug("\n--- Raw SMART Data: %s (ID: %s) ---", disk_dev, disk_id)
+        logging.debug("--- smartctl --json=c %s ---", smart_flags)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(json.dumps(smart, indent=2))
+        if smart_err: logging.debug("stderr: %s", smart_err)
         logging.debug("--- End Raw SMART Data ---")
 
-        if ret_info != 0 or ret_health != 0 or ret_attrs != 0:
-            logging.warning(f"Failed to get full SMART data for {disk_dev} (ID: {disk_id}). Skipping detailed report.")
-            if ret_health != 0:
-                 send_notification(f"⚠️ Drive {disk_dev} SMART Error - {HOSTNAME}", f"Could not retrieve SMART health for {disk_dev} (ID: {disk_id}). Check manually.", 8)
-            continue
+        if smart_failed:
+            logging.warning(f"Failed to get full SMART data for {disk_dev} (ID: {disk_id}, exit status {ret_smart}). Skipping detailed report.")
+            return f"⚠️ Drive {disk_dev} SMART Error{TITLE_HOST_SUFFIX}", f"Could not retrieve SMART health for {disk_dev} (ID: {disk_id}). Check manually.", 8
+        if ret_smart & SMART_COMMAND_FAILED_BIT:
+            logging.warning(f"Some SMART data could not be read for {disk_dev} (ID: {disk_id}, exit status {ret_smart}); the report may be incomplete.")
 
-        model = parse_smartctl_model(info_out)
-        health = parse_smartctl_health(health_out)
+        smart_info = parse_smartctl_all(smart)
+        model = smart_info.model
+        health = smart_info.health
 
         if "FAILED" in health:
             send_drive_notification = True
             drive_priority = 8
             drive_issue_reason = "SMART Health FAILED"
+        if ret_smart & SMART_PREFAIL_BIT:
+            send_drive_notification = True
+            drive_priority = 8
+            drive_issue_reason = drive_issue_reason or "Prefail attribute at/below threshold"
 
-        temp_raw = parse_smartctl_value(attrs_out, "Temperature")
-        if not temp_raw:
-             temp_raw = parse_smartctl_value(attrs_out, "Temperature_Celsius")
-
-        hours_raw = parse_smartctl_value(attrs_out, "Power On Hours")
-        if not hours_raw:
-             hours_raw = parse_smartctl_value(attrs_out, "Power_On_Hours")
-
-        percentage_used_raw = parse_smartctl_value(attrs_out, "Percentage Used")
-        life_remain_raw = parse_smartctl_value(attrs_out, "Percent_Lifetime_Remain")
-        wear_level_raw = parse_smartctl_value(attrs_out, "Wear_Leveling_Count")
-
-        data_units_written_raw = parse_smartctl_value(attrs_out, "Data Units Written")
-        lba_written_raw = parse_smartctl_value(attrs_out, "Total_LBAs_Written")
+        percentage_used_raw = smart_info.pct_used
+        life_remain_raw = smart_info.life_remain
+        wear_level_raw = smart_info.wear_lvl
 
-        erase_count_raw = parse_smartctl_value(attrs_out, "Ave_Block-Erase_Count")
+        data_units_written_raw = smart_info.data_units_written
+        lba_written_raw = smart_info.lba_written
 
-        temp = "N/A"
-        if temp_raw:
-            match = re.search(r'^\s*(\d+)', temp_raw)
-            if match:
-                temp = match.group(1)
+        erase_count_raw = smart_info.erase_count
 
-        hours = hours_raw if hours_raw else "N/A"
-        days_powered = "N/A"
+        temp = smart_info.temp
+        hours = smart_info.hours
+        days_powered_num = None
         life_used_str = "N/A"
 
-        try:
-            if hours != "N/A":
-                hours_num = int(hours.replace(',', ''))
-                if hours_num >= 0:
-                    days_powered = f"{hours_num / 24:.1f}"
-        except ValueError:
-            hours = "N/A"
+        if hours is not None and hours >= 0:
+            days_powered_num = hours / 24
 
-        try:
-            if percentage_used_raw is not None:
-                life_used = int(percentage_used_raw.replace('%',''))
-                life_used_str = f"{life_used}% used"
-            elif life_remain_raw is not None:
-                life_remain = int(life_remain_raw)
-                life_used = 100 - life_remain
-                life_used_str = f"{life_used}% used"
-            elif wear_level_raw is not None:
-                 wear_level = int(wear_level_raw)
-                 life_used_str = f"{wear_level}% used (WLC)"
-        except (ValueError, TypeError):
-             pass
+        if percentage_used_raw is not None:
+            life_used_str = f"{percentage_used_raw}% used"
+        elif life_remain_raw is not None:
+            life_used_str = f"{100 - life_remain_raw}% used"
+        elif wear_level_raw is not None:
+             life_used_str = f"{wear_level_raw}% used (WLC)"
 
         erase_count_str = ""
-        if erase_count_raw:
+        if erase_count_raw is not None:
              erase_count_str = f" | 🔄 Block Erase Count: {erase_count_raw}"
 
         drive_message_lines.append(f"{disk_dev} ({model}): {health}")
-        days_powered_str = f"({days_powered} days)" if days_powered != "N/A" else "(days N/A)"
-        drive_message_lines.append(f"🌡️ {temp}°C | ⏱️ {hours}h {days_powered_str} | 🔋 {life_used_str}")
+        days_powered_str = f"({days_powered_num:.1f} days)" if days_powered_num is not None else "(days N/A)"
+        temp_str = temp if temp is not None else "N/A"
+        hours_str = hours if hours is not None else "N/A"
+        drive_message_lines.append(f"🌡️ {temp_str}°C | ⏱️ {hours_str}h {days_powered_str} | 🔋 {life_used_str}")
 
         tb_written = None
         gb_per_day = 0.0
@@ -312,26 +502,19 @@ for disk_id in sorted(list(all_disks)):
         remaining_tb = None
         years_remaining = "N/A"
         days_remaining_num = None
+        replace_by_date = None
+        replace_label = ""
         replace_date_str = "N/A"
 
         try:
             if data_units_written_raw is not None:
-                 match = re.search(r'\[\s*([\d.]+)\s*TB\s*\]', data_units_written_raw)
-                 if match:
-                     tb_written = float(match.group(1))
-                 else:
-                     match_units = re.search(r'^\s*([\d,]+)', data_units_written_raw)
-                     if match_units:
-                         units_written = int(match_units.group(1).replace(',', ''))
-                         tb_written = (units_written * 512) / (1024**4)
+                 # NVMe data units are 1000 512-byte blocks
+                 tb_written = (data_units_written_raw * 512000) / (1000**4)
 
             elif lba_written_raw is not None:
-                lba_written = int(lba_written_raw.replace(',', ''))
-                tb_written = (lba_written * 512) / (1024**4)
-
-            if tb_written is not None and days_powered != "N/A" and RATED_TBW > 0:
-                days_powered_num = float(days_powered)
+                tb_written = (lba_written_raw * 512) / (1024**4)
 
+            if tb_written is not None and days_powered_num is not None and RATED_TBW > 0:
                 if days_powered_num > 0:
                     gb_per_day = (tb_written * 1024) / days_powered_num
                 else:
@@ -345,40 +528,34 @@ for disk_id in sorted(list(all_disks)):
                     if days_remaining_num >= 0:
                         years_remaining = f"{days_remaining_num / 365:.1f}"
 
-                        today = datetime.date.today()
-                        replace_by_age_date = today + datetime.timedelta(days=REPLACEMENT_YEARS_AGE_LIMIT * 365)
-                        replace_by_usage_date = today + datetime.timedelta(days=days_remaining_num)
+                        replace_by_usage_date = TODAY + datetime.timedelta(days=days_remaining_num)
 
-                        if replace_by_usage_date < replace_by_age_date:
-                            replace_date_str = f"{replace_by_usage_date.strftime('%Y-%m')} (TBW limited)"
+                        if replace_by_usage_date < REPLACE_BY_AGE_DATE:
+                            replace_by_date, replace_label = replace_by_usage_date, "TBW limited"
                         else:
-                            replace_date_str = f"{replace_by_age_date.strftime('%Y-%m')} (age limited)"
+                            replace_by_date, replace_label = REPLACE_BY_AGE_DATE, "age limited"
                     else:
-                         replace_date_str = "Now (TBW exceeded)"
+                         replace_label = "TBW exceeded"
                          years_remaining = "0.0"
 
                 elif remaining_tb >= 0:
-                    replace_date_str = f"> {REPLACEMENT_YEARS_AGE_LIMIT} years (low usage)"
-                    today = datetime.date.today()
-                    replace_by_age_date = today + datetime.timedelta(days=REPLACEMENT_YEARS_AGE_LIMIT * 365)
-                    replace_date_str = f"{replace_by_age_date.strftime('%Y-%m')} (age limited)"
+                    replace_by_date, replace_label = REPLACE_BY_AGE_DATE, "age limited"
+
+                if replace_label == "TBW exceeded":
+                    replace_date_str = "Now (TBW exceeded)"
+                elif replace_by_date is not None:
+                    replace_date_str = f"{replace_by_date.strftime('%Y-%m')} ({replace_label})"
 
                 replacement_imminent = False
-                if "Now (TBW exceeded)" in replace_date_str:
+                if replace_label == "TBW exceeded":
                     replacement_imminent = True
                     drive_priority = max(drive_priority, 8)
                     drive_issue_reason = drive_issue_reason or "TBW Exceeded"
-                elif "(TBW limited)" in replace_date_str or "(age limited)" in replace_date_str:
-                    try:
-                        replace_by_year_month = replace_date_str.split(" ")[0]
-                        replace_by_date = datetime.datetime.strptime(replace_by_year_month + "-01", "%Y-%m-%d").date()
-                        one_year_from_now = datetime.date.today() + datetime.timedelta(days=365)
-                        if replace_by_date <= one_year_from_now:
-                            replacement_imminent = True
-                            drive_priority = max(drive_priority, 5)
-                            drive_issue_reason = drive_issue_reason or f"Replacement suggested by {replace_by_year_month}"
-                    except ValueError:
-                        logging.warning(f"Could not parse replacement date string: {replace_date_str}")
+                # Compared at month granularity, matching the YYYY-MM shown in the message
+                elif replace_by_date is not None and replace_by_date.replace(day=1) <= ONE_YEAR_FROM_NOW:
+                    replacement_imminent = True
+                    drive_priority = max(drive_priority, 5)
+                    drive_issue_reason = drive_issue_reason or f"Replacement suggested by {replace_by_date.strftime('%Y-%m')}"
 
                 if replacement_imminent:
                     send_drive_notification = True
@@ -400,25 +577,77 @@ for disk_id in sorted(list(all_disks)):
              drive_issue_reason = drive_issue_reason or "Endurance calculation error"
 
         full_drive_message = "\n".join(drive_message_lines)
-        logging.debug(f"\n--- Formatted Summary: {disk_dev} (ID: {disk_id}) ---")
+        logging.debug("\n--- Formatted Summary: %s (ID: %s) ---", disk_dev, disk_id)
         logging.debug(full_drive_message)
         logging.debug("-----------------------------")
 
         if send_drive_notification:
-            notification_title = f"⚠️ Drive {disk_dev} Issue - {HOSTNAME}"
             if "FAILED" in health:
-                 notification_title = f"❌ Drive {disk_dev} FAILED - {HOSTNAME}"
+                 notification_title = f"❌ Drive {disk_dev} FAILED{TITLE_HOST_SUFFIX}"
             elif "TBW Exceeded" in drive_issue_reason:
-                 notification_title = f"❌ Drive {disk_dev} TBW Exceeded - {HOSTNAME}"
+                 notification_title = f"❌ Drive {disk_dev} TBW Exceeded{TITLE_HOST_SUFFIX}"
+            else:
+                 notification_title = f"⚠️ Drive {disk_dev} Issue{TITLE_HOST_SUFFIX}"
 
             logging.info(f"Sending notification for drive {disk_dev} due to: {drive_issue_reason}")
-            send_notification(notification_title, full_drive_message, drive_priority)
+            return notification_title, full_drive_message, drive_priority
         else:
              logging.info(f"Drive {disk_dev} status OK, no notification sent.")
 
     except Exception as e:
         logging.error(f"Error processing disk ID {disk_id}: {e}")
-        send_notification(f"⚠️ Error Processing Disk {disk_id} - {HOSTNAME}", f"An unexpected error occurred while processing disk ID {disk_id}. Check logs.", 8)
+        return f"⚠️ Error Processing Disk {disk_id}{TITLE_HOST_SUFFIX}", f"An unexpected error occurred while processing disk ID {disk_id}. Check logs.", 8
+
+    return None
+
+# --- Main Logic ---
+
+# Without a notification target the results would only go to the log, so don't bother
+# polling the pools and drives unless VERBOSE output was asked for
+if not (GOTIFY_ACTIVE or PUSHOVER_ACTIVE) and not VERBOSE:
+    logging.error("No notification target configured; exiting.")
+    sys.exit(2)
+
+# Notifications are sent in the background so they don't hold up the checks. A single
+# worker keeps them in submission order.
+notification_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+overall_health = "✅ Healthy"
+overall_priority = 1
+all_disks = set()
+main_message_parts = []
+
+logging.info("--- Starting ZFS Pool Check ---")
+
+with concurrent.futures.ThreadPoolExecutor(max_workers=len(POOLS_TO_MONITOR) or 1) as executor:
+    pool_results = list(executor.map(process_pool, POOLS_TO_MONITOR))
+
+for pool_summary, current_priority, pool_disks in pool_results:
+    if current_priority > overall_priority:
+        overall_priority = current_priority
+        overall_health = "⚠️ Check Details"
+
+    all_disks.update(pool_disks)
+    main_message_parts.append(pool_summary)
+
+logging.info("--- ZFS Pool Check Complete ---")
+
+full_main_message = f"\n\n---\n\n".join(main_message_parts)
+logging.info("Sending Summary Notification...")
+notification_executor.submit(send_notification, TITLE_POOL_SUMMARY, full_main_message, overall_priority)
+
+logging.info("--- Starting Disk SMART Check ---")
+smart_device_types = scan_smart_devices() if all_disks else {}
+with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(all_disks) or 1)) as executor:
+    disk_futures = {executor.submit(process_disk, disk_id, smart_device_types): disk_id for disk_id in sorted(all_disks)}
+    disk_results = {}
+    for future in concurrent.futures.as_completed(disk_futures):
+        disk_results[disk_futures[future]] = future.result()
+
+for disk_id in sorted(disk_results):
+    if disk_results[disk_id]:
+        notification_executor.submit(send_notification, *disk_results[disk_id])
 
 logging.info(f"--- Disk SMART Check Complete ---")
+notification_executor.shutdown(wait=True)
 logging.info(f"Monitoring check complete.")
\ No newline at end of file